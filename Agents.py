@@ -3,20 +3,411 @@
 # All agent implementations for Tic-Tac-Toe
 # =====================================================================
 
+import functools
 import random
+from collections import deque
 import numpy as np
 
+try:
+    from numba import config as numba_config, njit, prange, set_num_threads
+except ImportError:  # Numba is optional; the kernels below then run as plain Python
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+    prange = range
+    numba_config = None
 
-class RandomAgent:
+
+# The 8 symmetries of the 3x3 board (identity, 3 rotations and their
+# reflections) as index permutations: the transformed board is state[p].
+SYMMETRIES = np.array([
+    [0, 1, 2, 3, 4, 5, 6, 7, 8],  # identity
+    [6, 3, 0, 7, 4, 1, 8, 5, 2],  # rotate 90
+    [8, 7, 6, 5, 4, 3, 2, 1, 0],  # rotate 180
+    [2, 5, 8, 1, 4, 7, 0, 3, 6],  # rotate 270
+    [2, 1, 0, 5, 4, 3, 8, 7, 6],  # flip left-right
+    [6, 7, 8, 3, 4, 5, 0, 1, 2],  # flip up-down
+    [0, 3, 6, 1, 4, 7, 2, 5, 8],  # transpose
+    [8, 5, 2, 7, 4, 1, 6, 3, 0],  # anti-transpose
+])
+# INVERSE_SYMMETRIES[k][a] is the position board cell `a` moves to under SYMMETRIES[k]
+INVERSE_SYMMETRIES = np.argsort(SYMMETRIES, axis=1)
+
+# Boards index the dense (NUM_STATES, 9) Q-tables in base 3 with O -> 0, empty -> 1, X -> 2
+POW3 = 3 ** np.arange(9)
+NUM_STATES = 3 ** 9
+EMPTY_INDEX = int(POW3.sum())
+
+# Board printout shared by HumanAgent and GameManager
+SYMBOLS = {1: 'X', -1: 'O', 0: ' '}
+BOARD_TEMPLATE = "\n{} | {} | {}\n--+---+--\n{} | {} | {}\n--+---+--\n{} | {} | {}\n"
+
+# Cell indices of the 8 winning lines: rows, columns, diagonals
+LINES = np.array([
+    [0, 1, 2], [3, 4, 5], [6, 7, 8],
+    [0, 3, 6], [1, 4, 7], [2, 5, 8],
+    [0, 4, 8], [2, 4, 6],
+])
+
+
+@njit(cache=True)
+def canonical_index(state):
+    """
+    Map a board to the representative of its symmetry class.
+    Returns (state_idx, sym): the smallest base-3 index over the 8 symmetric
+    boards and the row of SYMMETRIES that produced it. A board action `a`
+    maps to INVERSE_SYMMETRIES[sym, a] and back via SYMMETRIES[sym, j].
+    """
+    idx = 0
+    for j in range(9):
+        idx += (state[j] + 1) * POW3[j]
+    return STATE_CANONICAL[idx], STATE_SYMMETRY[idx]
+
+
+@njit(cache=True)
+def choose_greedy(q_table, state_idx, moves, tie_break):
+    """Return the move with the highest Q-value; ties are split by `tie_break` (a random int)."""
+    best_q = q_table[state_idx, moves[0]]
+    n_best = 0
+    for a in moves:
+        q = q_table[state_idx, a]
+        if q > best_q:
+            best_q = q
+            n_best = 1
+        elif q == best_q:
+            n_best += 1
+    pick = tie_break % n_best
+    for a in moves:
+        if q_table[state_idx, a] == best_q:
+            if pick == 0:
+                return a
+            pick -= 1
+    return moves[0]
+
+
+@njit(cache=True)
+def epsilon_greedy(q_table, state_idx, sym, moves, epsilon, explore_draw, tie_break):
+    """
+    Epsilon-greedy choice among the board moves `moves` of canonical state
+    (state_idx, sym). The caller supplies the randomness: a uniform
+    `explore_draw` compared against epsilon and a random int `tie_break`.
+    """
+    if explore_draw < epsilon:
+        return moves[tie_break % len(moves)]
+    canon_moves = INVERSE_SYMMETRIES[sym][moves]
+    return SYMMETRIES[sym, choose_greedy(q_table, state_idx, canon_moves, tie_break)]
+
+
+@njit(cache=True)
+def q_update(q_table, state_idx, action, reward, next_idx, done, alpha, gamma):
+    """In-place Q-Learning update of q_table[state_idx, action]."""
+    old_value = q_table[state_idx, action]
+    if done:
+        target = reward
+    else:
+        target = reward + gamma * q_table[next_idx].max()
+    q_table[state_idx, action] = old_value + alpha * (target - old_value)
+
+
+@njit(cache=True)
+def sarsa_update(q_table, state_idx, action, reward, next_idx, next_action, done, alpha, gamma):
+    """In-place SARSA update of q_table[state_idx, action]."""
+    old_value = q_table[state_idx, action]
+    if done:
+        target = reward
+    else:
+        target = reward + gamma * q_table[next_idx, next_action]
+    q_table[state_idx, action] = old_value + alpha * (target - old_value)
+
+
+# Policies the compiled self-play kernels can play for either side, and their result for unfinished games
+POLICY_RANDOM = 0
+POLICY_SCRIPTED = 1
+POLICY_Q_LEARNING = 2
+ONGOING = 2
+# Stand-in Q-table for sides that do not learn (kernels always take one per side)
+NO_Q_TABLE = np.zeros((1, 9), dtype=np.float32)
+
+
+def _build_state_tables():
+    """
+    Canonical state index, symmetry and result (1 / -1 / 0 / ONGOING) for
+    every base-3 board index, so that play loops look positions up instead
+    of re-deriving them.
+    """
+    boards = (np.arange(NUM_STATES)[:, None] // POW3 % 3 - 1).astype(np.int8)
+    codes = (boards[:, SYMMETRIES] + 1) @ POW3
+    sym = codes.argmin(axis=1)
+    line_sums = boards[:, LINES].sum(axis=2)
+    result = np.where((line_sums == 3).any(axis=1), 1,
+                      np.where((line_sums == -3).any(axis=1), -1,
+                               np.where((boards != 0).all(axis=1), 0, ONGOING)))
+    return codes[np.arange(NUM_STATES), sym].astype(np.int32), sym.astype(np.int8), result.astype(np.int8)
+
+
+# Indexed by the base-3 index of a board as it stands (no symmetry applied)
+STATE_CANONICAL, STATE_SYMMETRY, STATE_RESULT = _build_state_tables()
+
+
+@njit(cache=True)
+def seed_kernels(seed):
+    """
+    Seed the compiled kernels' random generator for the calling thread only;
+    prange worker threads in self_play_batch keep their own unseeded streams.
+    """
+    np.random.seed(seed)
+
+
+def limit_kernel_threads(n_threads):
+    """Cap the threads the parallel kernels use in this process (no-op without Numba)."""
+    if numba_config is not None:
+        set_num_threads(max(1, min(n_threads, numba_config.NUMBA_NUM_THREADS)))
+
+
+@njit(cache=True)
+def random_move(board):
+    """Uniformly random empty cell."""
+    n_free = 0
+    for cell in range(9):
+        if board[cell] == 0:
+            n_free += 1
+    pick = np.random.randint(n_free)
+    for cell in range(9):
+        if board[cell] == 0:
+            if pick == 0:
+                return cell
+            pick -= 1
+    return -1
+
+
+@njit(cache=True)
+def scripted_move(board):
+    """Compiled ScriptedAgent policy: complete an X line, block an O line, center, else random."""
+    for player in (1, -1):
+        for line in range(len(LINES)):
+            s = board[LINES[line, 0]] + board[LINES[line, 1]] + board[LINES[line, 2]]
+            if s == 2 * player:
+                for cell in LINES[line]:
+                    if board[cell] == 0:
+                        return cell
+    if board[4] == 0:
+        return 4
+    return random_move(board)
+
+
+@njit(cache=True)
+def play_one_game(policy_x, q_table_x, params_x, policy_o, q_table_o, params_o):
+    """
+    One training game between two compiled policies, mirroring GameManager.play_game.
+    Each side is a POLICY_* code, its Q-table and its (alpha, gamma, epsilon);
+    POLICY_Q_LEARNING sides play epsilon-greedy and update their table in place.
+    Returns the winner.
+    """
+    board = np.zeros(9, dtype=np.int8)
+    board_idx = EMPTY_INDEX  # base-3 index of board, for the STATE_* lookups
+    player = 1
+    while True:
+        if player == 1:
+            policy, q_table, (alpha, gamma, epsilon) = policy_x, q_table_x, params_x
+        else:
+            policy, q_table, (alpha, gamma, epsilon) = policy_o, q_table_o, params_o
+
+        if policy == POLICY_Q_LEARNING:
+            state_idx, sym = STATE_CANONICAL[board_idx], STATE_SYMMETRY[board_idx]
+            action = epsilon_greedy(q_table, state_idx, sym, np.flatnonzero(board == 0), epsilon,
+                                    np.random.random(), np.random.randint(2 ** 31))
+        elif policy == POLICY_SCRIPTED:
+            action = scripted_move(board)
+        else:
+            action = random_move(board)
+        board[action] = player
+        board_idx += player * POW3[action]
+        result = STATE_RESULT[board_idx]
+
+        if policy == POLICY_Q_LEARNING:
+            if result == player:
+                reward = 1.0
+            elif result == 0:
+                reward = 0.5
+            else:
+                reward = 0.0
+            q_update(q_table, state_idx, INVERSE_SYMMETRIES[sym, action], reward,
+                     STATE_CANONICAL[board_idx], result != ONGOING, alpha, gamma)
+
+        if result != ONGOING:
+            return result
+        player = -player
+
+
+@njit(cache=True, parallel=True)
+def self_play_batch(n_episodes, policy_x, q_table_x, params_x, policy_o, q_table_o, params_o):
+    """
+    Play n_episodes independent training games in parallel, all updating the
+    shared Q-tables without locks (Hogwild!-style). Returns each game's winner.
+    """
+    results = np.empty(n_episodes, dtype=np.int64)
+    for i in prange(n_episodes):
+        results[i] = play_one_game(policy_x, q_table_x, params_x, policy_o, q_table_o, params_o)
+    return results
+
+
+@njit(cache=True)
+def self_play_serial(n_episodes, policy_x, q_table_x, params_x, policy_o, q_table_o, params_o):
+    """self_play_batch on the calling thread only, so that seed_kernels makes it reproducible."""
+    results = np.empty(n_episodes, dtype=np.int64)
+    for i in range(n_episodes):
+        results[i] = play_one_game(policy_x, q_table_x, params_x, policy_o, q_table_o, params_o)
+    return results
+
+
+def decode_state(state_idx):
+    """Board for a base-3 state index (inverse of the encoding used by canonical_index)."""
+    return (state_idx // POW3 % 3 - 1).astype(np.int8)
+
+
+def enumerate_states():
+    """
+    Breadth-first enumeration of every reachable position, up to symmetry.
+    Returns (states, edges): canonical state indices in BFS order (terminal
+    positions included), and for each non-terminal one a list of
+    (action, child_idx, winner) with actions in the canonical frame and
+    winner None while the game continues.
+    """
+    states = [EMPTY_INDEX]
+    edges = {}
+    seen = {EMPTY_INDEX}
+    queue = deque(states)
+    while queue:
+        state_idx = queue.popleft()
+        state = decode_state(state_idx)
+        player = 1 if np.count_nonzero(state) % 2 == 0 else -1
+        edges[state_idx] = []
+        for action in np.flatnonzero(state == 0):
+            child = state.copy()
+            child[action] = player
+            child_idx = int(canonical_index(child)[0])
+            if (np.abs(child[LINES].sum(axis=1)) == 3).any():
+                winner = player
+            elif np.all(child != 0):
+                winner = 0
+            else:
+                winner = None
+            edges[state_idx].append((int(action), child_idx, winner))
+            if child_idx not in seen:
+                seen.add(child_idx)
+                states.append(child_idx)
+                if winner is None:
+                    queue.append(child_idx)
+    return states, edges
+
+
+def solve_q_table(q_table, gamma, tol=1e-8):
+    """
+    Fill q_table by value iteration over the enumerated game graph.
+
+    Q-values are from the point of view of the player to move: a winning move
+    is worth 1 and a drawing move 0.5, as GameManager rewards them, and a move
+    after which the opponent wins is worth -1. The opponent is assumed to reply
+    greedily on the same table, ties going against us. This is not the frame
+    q_update / sarsa_update bootstrap in, so a solved table is meant for play,
+    not for further training.
+    Returns the number of sweeps until no value changed by more than `tol`.
+    """
+    states, edges = enumerate_states()
+    order = [s for s in reversed(states) if s in edges]  # children before parents
+
+    def best_q(state_idx):
+        return max(q_table[state_idx, a] for a, _, _ in edges[state_idx])
+
+    sweeps = 0
+    while True:
+        sweeps += 1
+        delta = 0.0
+        for state_idx in order:
+            for action, child_idx, winner in edges[state_idx]:
+                if winner is not None:
+                    value = 1.0 if winner != 0 else 0.5
+                else:
+                    reply_q = best_q(child_idx)
+                    value = min(
+                        (-1.0 if w else 0.5) if w is not None else gamma * best_q(grandchild_idx)
+                        for a, grandchild_idx, w in edges[child_idx]
+                        if q_table[child_idx, a] == reply_q
+                    )
+                delta = max(delta, abs(value - q_table[state_idx, action]))
+                q_table[state_idx, action] = value
+        if delta < tol:
+            return sweeps
+
+
+def canonical_index_batch(boards):
+    """canonical_index over an (N, 9) array of boards; returns (state_idx, sym) arrays."""
+    board_idx = (boards + 1) @ POW3
+    return STATE_CANONICAL[board_idx], STATE_SYMMETRY[board_idx]
+
+
+def epsilon_greedy_batch(q_table, boards, epsilon, rng):
+    """
+    epsilon_greedy over an (N, 9) array of boards with at least one empty cell.
+    One (N, 9) uniform draw from `rng` breaks ties among the greedy moves, or
+    among all legal moves for the rows that explore.
+    """
+    state_idx, sym = canonical_index_batch(boards)
+    legal = boards == 0
+    q_values = np.where(legal, q_table[state_idx[:, None], INVERSE_SYMMETRIES[sym]], -np.inf)
+    greedy = q_values == q_values.max(axis=1, keepdims=True)
+    explore = rng.random(len(boards)) < epsilon
+    candidates = np.where(explore[:, None], legal, greedy)
+    return (rng.random(boards.shape) * candidates).argmax(axis=1)
+
+
+@functools.lru_cache(maxsize=8192)
+def _scripted_move(state_idx):
+    """
+    Deterministic part of the ScriptedAgent policy for a canonical state index,
+    in the canonical frame: the cell completing an X line, else the cell
+    blocking an O line, else the center, else None (move at random).
+    """
+    state = decode_state(state_idx)
+    sums = state[LINES].sum(axis=1)
+    for player in (1, -1):
+        for line_idx in np.flatnonzero(sums == 2 * player):
+            cells = LINES[line_idx]
+            zero_cell = cells[state[cells] == 0]
+            if len(zero_cell):
+                return int(zero_cell[0])
+    if state[4] == 0:
+        return 4
+    return None
+
+
+class _NonLearningAgent:
+    """Mixin for agents that play a fixed policy: GameManager's learn hook does nothing."""
+
+    def learn(self, state_key, action, reward, next_state_key, next_available, done):
+        """Non-learning agent: nothing to update."""
+
+
+class RandomAgent(_NonLearningAgent):
     """Agent that plays random valid moves."""
-    def __init__(self, name="Random"):
+    def __init__(self, name="Random", seed=None):
         self.name = name
+        self._rng = random.Random(seed)
+        self._randrange = self._rng.randrange
+        self._np_rng = np.random.default_rng(seed)
     
-    def choose_action(self, state, available_moves):
-        return random.choice(available_moves)
+    def choose_action(self, state, available_moves, training=False, state_key=None):
+        return available_moves[self._randrange(len(available_moves))]
+
+    def act_batch(self, boards, training=False):
+        """Uniform random legal move for each of an (N, 9) array of boards, from one noise draw."""
+        noise = self._np_rng.random(boards.shape)
+        noise[boards != 0] = -1.0
+        return noise.argmax(axis=1)
 
 
-class ScriptedAgent:
+class ScriptedAgent(_NonLearningAgent):
     """
     Agent that follows simple strategy:
       1. Win if possible
@@ -24,124 +415,168 @@ class ScriptedAgent:
       3. Take center if available
       4. Else, pick random corner or side
     """
-    def __init__(self, name="Scripted"):
+    def __init__(self, name="Scripted", seed=None):
         self.name = name
+        self._rng = random.Random(seed)
+        self._randrange = self._rng.randrange
     
-    def choose_action(self, state, available_moves):
-        b = np.array(state).reshape(3, 3)
-
-        def can_win(player):
-            for i in range(3):
-                # rows
-                if np.sum(b[i]) == 2 * player and 0 in b[i]:
-                    return (i, np.where(b[i] == 0)[0][0])
-                # columns
-                if np.sum(b[:, i]) == 2 * player and 0 in b[:, i]:
-                    return (np.where(b[:, i] == 0)[0][0], i)
-            # diagonals
-            if np.sum(np.diag(b)) == 2 * player and 0 in np.diag(b):
-                idx = np.where(np.diag(b) == 0)[0][0]
-                return (idx, idx)
-            if np.sum(np.diag(np.fliplr(b))) == 2 * player and 0 in np.diag(np.fliplr(b)):
-                idx = np.where(np.diag(np.fliplr(b)) == 0)[0][0]
-                return (idx, 2 - idx)
-            return None
-
-        # 1. Try to win
-        move = can_win(1)
-        if move:
-            return move[0] * 3 + move[1]
-
-        # 2. Try to block
-        move = can_win(-1)
-        if move:
-            return move[0] * 3 + move[1]
-
-        # 3. Take center if free
-        if 4 in available_moves:
-            return 4
+    def choose_action(self, state, available_moves, training=False, state_key=None):
+        state_idx, sym = state_key if state_key is not None else canonical_index(np.asarray(state))
+
+        # 1-3. Win, block or take the center (cached per symmetry class)
+        move = _scripted_move(int(state_idx))
+        if move is not None:
+            return int(SYMMETRIES[sym, move])
 
         # 4. Else, pick random available move
-        return random.choice(available_moves)
+        return available_moves[self._randrange(len(available_moves))]
 
 
-class QLearningAgent:
-    """Agent that learns via off-policy Q-Learning."""
+class _TabularAgent:
+    """Shared Q-table, epsilon-greedy play and solving for the learning agents."""
 
-    def __init__(self, alpha=0.1, gamma=0.9, epsilon=0.2, name="Q-Learning"):
-        self.q_table = {}
+    def __init__(self, alpha, gamma, epsilon, name, seed):
+        self.q_table = np.zeros((NUM_STATES, 9), dtype=np.float32)
         self.alpha = alpha
         self.gamma = gamma
         self.epsilon = epsilon
         self.name = name
+        self.q_table_int8 = None  # set by freeze(); used for greedy (training=False) play
+        self._rng = random.Random(seed)
+        self._np_rng = np.random.default_rng(seed)
 
     def get_state_key(self, state):
-        return tuple(state)
-
-    def choose_action(self, state, available_moves, training=True):
-        state_key = self.get_state_key(state)
-        if training and random.uniform(0, 1) < self.epsilon:
-            return random.choice(available_moves)
-        q_values = [self.q_table.get((state_key, a), 0) for a in available_moves]
-        max_q = max(q_values)
-        best_actions = [a for a, q in zip(available_moves, q_values) if q == max_q]
-        return random.choice(best_actions)
-
-    def update(self, state, action, reward, next_state, done):
-        state_key = self.get_state_key(state)
-        next_key = self.get_state_key(next_state)
-        old_value = self.q_table.get((state_key, action), 0)
-
-        if done:
-            target = reward
-        else:
-            future_qs = [self.q_table.get((next_key, a), 0) for a in range(9)]
-            target = reward + self.gamma * max(future_qs)
+        """Canonical board index under the 8 board symmetries, plus the symmetry used."""
+        state_idx, sym = canonical_index(np.asarray(state))
+        return int(state_idx), int(sym)
 
-        self.q_table[(state_key, action)] = old_value + self.alpha * (target - old_value)
+    def choose_action(self, state, available_moves, training=True, state_key=None):
+        """Epsilon-greedy move; `state_key` may be passed in to skip recomputing it from `state`."""
+        state_idx, sym = state_key if state_key is not None else self.get_state_key(state)
+        q_table, epsilon = self._policy(training)
+        return int(epsilon_greedy(q_table, state_idx, sym, np.asarray(available_moves),
+                                  epsilon, self._rng.random(), self._rng.getrandbits(32)))
 
+    def act_batch(self, boards, training=True):
+        """Vectorized choose_action over an (N, 9) array of boards."""
+        q_table, epsilon = self._policy(training)
+        return epsilon_greedy_batch(q_table, boards, epsilon, self._np_rng)
 
-class SARSAAgent:
-    """Agent that learns via on-policy SARSA."""
-    def __init__(self, alpha=0.1, gamma=0.9, epsilon=0.2, name="SARSA"):
-        self.q_table = {}
-        self.alpha = alpha
-        self.gamma = gamma
-        self.epsilon = epsilon
-        self.name = name
+    def _policy(self, training):
+        """(Q-table, epsilon) to act with: the float table while training, else the frozen int8 one if any."""
+        if training or self.q_table_int8 is None:
+            return self.q_table, self.epsilon if training else 0.0
+        return self.q_table_int8, 0.0
 
-    def get_state_key(self, state):
-        return tuple(state)
-
-    def choose_action(self, state, available_moves, training=True):
-        state_key = self.get_state_key(state)
-        if training and random.uniform(0, 1) < self.epsilon:
-            return random.choice(available_moves)
-        q_values = [self.q_table.get((state_key, a), 0) for a in available_moves]
-        max_q = max(q_values)
-        best_actions = [a for a, q in zip(available_moves, q_values) if q == max_q]
-        return random.choice(best_actions)
-
-    def update(self, state, action, reward, next_state, next_action, done):
-        state_key = self.get_state_key(state)
-        next_key = self.get_state_key(next_state)
-        old_value = self.q_table.get((state_key, action), 0)
-        next_value = self.q_table.get((next_key, next_action), 0)
-
-        if done:
-            target = reward
+    def solve(self):
+        """Compute the Q-table directly by value iteration instead of sampling games."""
+        return solve_q_table(self.q_table, self.gamma)
+
+    def freeze(self):
+        """
+        Quantize the Q-table to int8 with one scale per state for greedy play.
+        Rounding keeps the order of Q-values within a state, so argmax needs no
+        rescaling. Call again after further training.
+        """
+        scale = np.abs(self.q_table).max(axis=1, keepdims=True) / 127
+        scale[scale == 0] = 1
+        self.q_table_int8 = np.round(self.q_table / scale).astype(np.int8)
+
+
+class QLearningAgent(_TabularAgent):
+    """Agent that learns via off-policy Q-Learning."""
+
+    def __init__(self, alpha=0.1, gamma=0.9, epsilon=0.2, name="Q-Learning", seed=None):
+        super().__init__(alpha, gamma, epsilon, name, seed)
+        # Seeded agents train on one thread: the parallel kernel's threads cannot be seeded
+        self._self_play = self_play_serial if seed is not None else self_play_batch
+
+    def update(self, state_key, action, reward, next_state_key, done):
+        """Q-Learning update; states are given as keys from get_state_key / GameManager.state_key."""
+        state_idx, sym = state_key
+        next_idx, _ = next_state_key
+        action = INVERSE_SYMMETRIES[sym, action]
+        q_update(self.q_table, state_idx, action, reward, next_idx, done, self.alpha, self.gamma)
+
+    def learn(self, state_key, action, reward, next_state_key, next_available, done):
+        """Per-ply training hook called by GameManager."""
+        self.update(state_key, action, reward, next_state_key, done)
+
+    def learn_batch(self, boards, actions, rewards, next_boards, done):
+        """Vectorized learn over N transitions; repeated (state, action) pairs keep the last update."""
+        state_idx, sym = canonical_index_batch(boards)
+        next_idx, _ = canonical_index_batch(next_boards)
+        actions = INVERSE_SYMMETRIES[sym, actions]
+        old_values = self.q_table[state_idx, actions]
+        targets = np.where(done, rewards, rewards + self.gamma * self.q_table[next_idx].max(axis=1))
+        self.q_table[state_idx, actions] = old_values + self.alpha * (targets - old_values)
+
+    def train_batch(self, n_episodes, opponent):
+        """
+        Play n_episodes training games as X inside the compiled parallel kernel
+        against a RandomAgent, ScriptedAgent or another QLearningAgent (which
+        learns as well). Returns the winner of each game as an int array.
+        Unseeded agents use all kernel threads and are not reproducible; with a
+        seed the games run serially so the same seed gives the same games.
+        """
+        if isinstance(opponent, QLearningAgent):
+            policy_o, q_table_o = POLICY_Q_LEARNING, opponent.q_table
+            params_o = (float(opponent.alpha), float(opponent.gamma), float(opponent.epsilon))
+        elif isinstance(opponent, (RandomAgent, ScriptedAgent)):
+            policy_o = POLICY_SCRIPTED if isinstance(opponent, ScriptedAgent) else POLICY_RANDOM
+            q_table_o, params_o = NO_Q_TABLE, (0.0, 0.0, 0.0)
         else:
-            target = reward + self.gamma * next_value
+            raise ValueError(f"train_batch cannot simulate opponent {opponent.name!r}")
+        seed_kernels(self._rng.getrandbits(32))
+        return self._self_play(n_episodes, POLICY_Q_LEARNING, self.q_table,
+                               (float(self.alpha), float(self.gamma), float(self.epsilon)),
+                               policy_o, q_table_o, params_o)
+
+
+class SARSAAgent(_TabularAgent):
+    """Agent that learns via on-policy SARSA."""
+
+    def __init__(self, alpha=0.1, gamma=0.9, epsilon=0.2, name="SARSA", seed=None):
+        super().__init__(alpha, gamma, epsilon, name, seed)
+
+    def update(self, state_key, action, reward, next_state_key, next_action, done):
+        """SARSA update; states are given as keys from get_state_key / GameManager.state_key."""
+        state_idx, sym = state_key
+        next_idx, next_sym = next_state_key
+        action = INVERSE_SYMMETRIES[sym, action]
+        next_action = INVERSE_SYMMETRIES[next_sym, next_action]
+        sarsa_update(self.q_table, state_idx, action, reward, next_idx, next_action,
+                     done, self.alpha, self.gamma)
+
+    def learn(self, state_key, action, reward, next_state_key, next_available, done):
+        """Per-ply training hook called by GameManager; picks the on-policy next action itself."""
+        if done or not next_available:
+            return
+        next_action = self.choose_action(None, next_available, training=True, state_key=next_state_key)
+        self.update(state_key, action, reward, next_state_key, next_action, done)
 
-        self.q_table[(state_key, action)] = old_value + self.alpha * (target - old_value)
+    def learn_batch(self, boards, actions, rewards, next_boards, done):
+        """Vectorized learn over N transitions; like learn, terminal transitions are skipped."""
+        live = ~done
+        if not live.any():
+            return
+        boards, actions, rewards, next_boards = boards[live], actions[live], rewards[live], next_boards[live]
+        next_actions = self.act_batch(next_boards, training=True)
+        state_idx, sym = canonical_index_batch(boards)
+        next_idx, next_sym = canonical_index_batch(next_boards)
+        actions = INVERSE_SYMMETRIES[sym, actions]
+        next_actions = INVERSE_SYMMETRIES[next_sym, next_actions]
+        old_values = self.q_table[state_idx, actions]
+        targets = rewards + self.gamma * self.q_table[next_idx, next_actions]
+        self.q_table[state_idx, actions] = old_values + self.alpha * (targets - old_values)
 
 
-class HumanAgent:
+class HumanAgent(_NonLearningAgent):
     """Agent controlled by human input."""
     def __init__(self, name="Human"):
         self.name = name
     
-    def choose_action(self, state, available_moves):
+    def choose_action(self, state, available_moves, training=False, state_key=None):
         print("\nCurrent board state:")
         self.render_board(state)
         print(f"Available moves: {available_moves}")
@@ -158,10 +593,4 @@ class HumanAgent:
     
     def render_board(self, state):
         """Print board with position numbers."""
-        symbols = {1: 'X', -1: 'O', 0: ' '}
-        b = [symbols[x] if x != 0 else str(i) for i, x in enumerate(state)]
-        print(f"\n{b[0]} | {b[1]} | {b[2]}")
-        print("--+---+--")
-        print(f"{b[3]} | {b[4]} | {b[5]}")
-        print("--+---+--")
-        print(f"{b[6]} | {b[7]} | {b[8]}\n")
\ No newline at end of file
+        print(BOARD_TEMPLATE.format(*[SYMBOLS[x] if x != 0 else str(i) for i, x in enumerate(state)]))
\ No newline at end of file
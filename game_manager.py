@@ -4,7 +4,33 @@
 # =====================================================================
 
 import numpy as np
-from agents import QLearningAgent, SARSAAgent
+from agents import LINES, EMPTY_INDEX, ONGOING, STATE_CANONICAL, STATE_SYMMETRY, STATE_RESULT, SYMBOLS, BOARD_TEMPLATE
+
+
+# Each winning line as a 9-bit mask over cells (bit i = cell i)
+WIN_MASKS = np.array([sum(1 << cell for cell in line) for line in LINES.tolist()], dtype=np.uint16)
+FULL_MASK = 0x1FF
+CELL_BITS = (1 << np.arange(9)).astype(np.uint16)
+# WINNING[mask]: whether a player holding the cells of `mask` has a line
+WINNING = ((np.arange(FULL_MASK + 1, dtype=np.uint16)[:, None] & WIN_MASKS) == WIN_MASKS).any(axis=1)
+
+
+def bits_to_list(mask):
+    """Indices of the set bits of `mask`, lowest first."""
+    cells = []
+    while mask:
+        low = mask & -mask
+        cells.append(low.bit_length() - 1)
+        mask ^= low
+    return cells
+
+
+def choose_actions(agent, boards, train):
+    """Moves for an (N, 9) array of boards, batched when the agent supports it."""
+    if hasattr(agent, "act_batch"):
+        return agent.act_batch(boards, training=train)
+    return np.array([agent.choose_action(board, np.flatnonzero(board == 0).tolist(), training=train)
+                     for board in boards])
 
 
 class GameManager:
@@ -21,22 +47,32 @@ class GameManager:
 
     def reset_board(self):
         """Resets the Tic-Tac-Toe board and state."""
-        self.board = np.zeros(9, dtype=int)
+        self.board = np.zeros(9, dtype=np.int8)
         self.current_player = 1
+        self.empty_bits = FULL_MASK  # bitmask of the empty cells
+        self.board_index = EMPTY_INDEX  # base-3 index of the board, for the STATE_* lookups
         return self.board
 
+    def make_move(self, action):
+        """Place the current player's mark, updating the empty-cell mask and state index incrementally."""
+        self.board[action] = self.current_player
+        self.board_index += self.current_player * 3 ** action
+        self.empty_bits &= ~(1 << action)
+
+    def available_bits(self):
+        """Bitmask of the empty cells."""
+        return self.empty_bits
+
+    def state_key(self):
+        """Canonical (state_idx, sym) key of the current board, as used by the learning agents."""
+        return int(STATE_CANONICAL[self.board_index]), int(STATE_SYMMETRY[self.board_index])
+
     def check_winner(self):
-        """Check if there is a winner or draw."""
-        b = self.board.reshape(3, 3)
-        lines = np.concatenate([b, b.T, [b.diagonal()], [np.fliplr(b).diagonal()]])
-        for line in lines:
-            if np.all(line == 1):
-                return 1   # X wins
-            if np.all(line == -1):
-                return -1  # O wins
-        if 0 not in self.board:
-            return 0       # Draw
-        return None        # Game continues
+        """Check if there is a winner or draw, by table lookup on the board index."""
+        result = int(STATE_RESULT[self.board_index])
+        if result == ONGOING:
+            return None         # Game continues
+        return result           # 1 if X wins, -1 if O wins, 0 for a draw
 
     def play_game(self, train=True):
         """
@@ -44,21 +80,19 @@ class GameManager:
         Returns: +1 if X wins, -1 if O wins, 0 if draw
         """
         self.reset_board()
-        state = self.board.copy()
+        state_key = self.state_key()
+        available_moves = bits_to_list(self.available_bits())
         done = False
 
         while not done:
             agent = self.agent_x if self.current_player == 1 else self.agent_o
-            available_moves = [i for i, v in enumerate(self.board) if v == 0]
-            
+
             # Choose action (with training flag)
-            if isinstance(agent, (QLearningAgent, SARSAAgent)):
-                action = agent.choose_action(self.board, available_moves, training=train)
-            else:
-                action = agent.choose_action(self.board, available_moves)
+            action = agent.choose_action(self.board, available_moves, training=train, state_key=state_key)
 
             # Apply move
-            self.board[action] = self.current_player
+            self.make_move(action)
+            available_moves = bits_to_list(self.available_bits())
 
             # Check game result
             winner = self.check_winner()
@@ -75,28 +109,14 @@ class GameManager:
             else:
                 reward_x, reward_o = 0, 0
 
-            next_state = self.board.copy()
+            next_state_key = self.state_key()
 
-            # Update learning agents
+            # Let the agent that just moved learn from it
             if train:
-                if self.current_player == 1:
-                    if isinstance(self.agent_x, QLearningAgent):
-                        self.agent_x.update(state, action, reward_x, next_state, done)
-                    elif isinstance(self.agent_x, SARSAAgent) and not done:
-                        next_available = [i for i, v in enumerate(next_state) if v == 0]
-                        if next_available:
-                            next_action = self.agent_x.choose_action(next_state, next_available, training=True)
-                            self.agent_x.update(state, action, reward_x, next_state, next_action, done)
-                else:
-                    if isinstance(self.agent_o, QLearningAgent):
-                        self.agent_o.update(state, action, reward_o, next_state, done)
-                    elif isinstance(self.agent_o, SARSAAgent) and not done:
-                        next_available = [i for i, v in enumerate(next_state) if v == 0]
-                        if next_available:
-                            next_action = self.agent_o.choose_action(next_state, next_available, training=True)
-                            self.agent_o.update(state, action, reward_o, next_state, next_action, done)
-
-            state = next_state
+                reward = reward_x if self.current_player == 1 else reward_o
+                agent.learn(state_key, action, reward, next_state_key, available_moves, done)
+
+            state_key = next_state_key
             self.current_player *= -1
 
         if self.verbose:
@@ -112,10 +132,79 @@ class GameManager:
 
     def render_board(self):
         """Print board nicely."""
-        symbols = {1: 'X', -1: 'O', 0: ' '}
-        b = [symbols[x] for x in self.board]
-        print(f"\n{b[0]} | {b[1]} | {b[2]}")
-        print("--+---+--")
-        print(f"{b[3]} | {b[4]} | {b[5]}")
-        print("--+---+--")
-        print(f"{b[6]} | {b[7]} | {b[8]}\n")
\ No newline at end of file
+        print(BOARD_TEMPLATE.format(*[SYMBOLS[x] for x in self.board]))
+
+
+class VectorGameManager:
+    def __init__(self, agent_x, agent_o, batch_size=64):
+        """
+        Plays batch_size games between the same two agents in lockstep, as a
+        MultiExperimentRunner with a single (agent_x, agent_o) pair.
+        Agents with act_batch / learn_batch get whole (N, 9) board arrays per
+        ply; others are asked one board at a time through choose_action.
+        """
+        self.agent_x = agent_x
+        self.agent_o = agent_o
+        self.batch_size = batch_size
+        self._runner = MultiExperimentRunner([(agent_x, agent_o)], batch_size=batch_size)
+
+    def play_batch(self, train=True, n_games=None):
+        """
+        Plays n_games (default batch_size) full games.
+        Returns: int8 array with +1 where X won, -1 where O won, 0 for draws
+        """
+        return self._runner.play_batch(train=train, n_games=n_games)[0]
+
+
+class MultiExperimentRunner:
+    def __init__(self, agent_pairs, batch_size=64):
+        """
+        Plays batch_size games for each (agent_x, agent_o) pair, all in one
+        lockstep rollout: the boards of every experiment share one
+        (n_experiments, batch_size, 9) array and one win check per ply.
+        """
+        self.agent_pairs = agent_pairs
+        self.batch_size = batch_size
+
+    def play_batch(self, train=True, n_games=None):
+        """
+        Plays n_games (default batch_size) full games per experiment.
+        Returns: int8 array of shape (n_experiments, n_games) with +1 where X
+        won, -1 where O won, 0 for draws
+        """
+        n_games = n_games or self.batch_size
+        shape = (len(self.agent_pairs), n_games)
+        boards = np.zeros(shape + (9,), dtype=np.int8)
+        masks = {1: np.zeros(shape, dtype=np.uint16), -1: np.zeros(shape, dtype=np.uint16)}
+        results = np.zeros(shape, dtype=np.int8)
+        done = np.zeros(shape, dtype=bool)
+        player = 1
+
+        while not done.all():
+            # Each experiment's mover picks moves for its unfinished games
+            moves = []
+            for e, (agent_x, agent_o) in enumerate(self.agent_pairs):
+                agent = agent_x if player == 1 else agent_o
+                live = np.flatnonzero(~done[e])
+                before = boards[e, live]
+                actions = choose_actions(agent, before, train) if len(live) else live
+                boards[e, live, actions] = player
+                masks[player][e, live] |= CELL_BITS[actions]
+                moves.append((agent, live, before, actions))
+
+            # Check game results across all experiments at once, on the bitboards
+            won = WINNING[masks[player]] & ~done
+            finished = (won | ((masks[1] | masks[-1]) == FULL_MASK)) & ~done
+            results[won] = player
+            done |= finished
+
+            # Mover's reward, as in GameManager.play_game: win 1, draw 0.5
+            if train:
+                rewards = np.where(won, 1.0, np.where(finished, 0.5, 0.0))
+                for e, (agent, live, before, actions) in enumerate(moves):
+                    if len(live) and hasattr(agent, "learn_batch"):
+                        agent.learn_batch(before, actions, rewards[e, live], boards[e, live], finished[e, live])
+
+            player = -player
+
+        return results
@@ -3,21 +3,50 @@
 # Training system with history tracking and visualization
 # =====================================================================
 
-import matplotlib.pyplot as plt
-from game_manager import GameManager
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+import numpy as np
+from game_manager import GameManager, VectorGameManager, MultiExperimentRunner
 from agents import QLearningAgent, SARSAAgent, RandomAgent, ScriptedAgent
+from agents import limit_kernel_threads, play_one_game, NUM_STATES, NO_Q_TABLE, POLICY_Q_LEARNING, POLICY_SCRIPTED
 
 
 class Trainer:
     """Trains a single agent pair and tracks performance history."""
     
-    def __init__(self, agent_x, agent_o, episodes=10000, checkpoint_interval=500):
+    def __init__(self, agent_x, agent_o, episodes=10000, checkpoint_interval=500, batch=False,
+                 vector_size=None, name=None, checkpoint_dir=None, learn=True):
+        """
+        batch: play the episodes through agent_x.train_batch (compiled, parallel
+        self-play) one checkpoint interval at a time instead of GameManager.
+        vector_size: play that many games at a time in lockstep through
+        VectorGameManager instead of GameManager.
+        checkpoint_dir: if set, save Q-tables, results and history there at
+        every checkpoint as {name}_{episode}.npz, keeping the latest 3.
+        learn: with False the agents play greedily without updating, e.g. to
+        measure a solved Q-table (batch is then ignored).
+        """
         self.agent_x = agent_x
         self.agent_o = agent_o
         self.episodes = episodes
         self.checkpoint_interval = checkpoint_interval
+        self.batch = batch
+        self.learn = learn
+        self.vector_size = vector_size
+        self.name = name or f"{agent_x.name} vs {agent_o.name}"
+        self.checkpoint_dir = checkpoint_dir
+        self.start_episode = 0  # episodes already recorded; advanced by record(), set by resume()
+        self._checkpoints = deque()  # saved checkpoint paths, oldest first
         
-        # Track results
+        # Track results: per-episode winner (+1 X, -1 O, 0 draw) and totals
+        self._raw = np.empty(episodes, dtype=np.int8)
         self.results = {"X_wins": 0, "O_wins": 0, "Draws": 0}
         
         # Track history for plotting
@@ -28,42 +57,169 @@ class Trainer:
             "draw_rate": []
         }
 
+        # Progress messages, written to stdout in one go by flush_log
+        self._log_buf = []
+
     def train(self):
         """Trains agents over multiple episodes."""
         gm = GameManager(self.agent_x, self.agent_o, verbose=False)
-        
-        temp_wins_x = 0
-        temp_wins_o = 0
-        temp_draws = 0
-
-        for episode in range(1, self.episodes + 1):
-            result = gm.play_game(train=True)
-
-            if result == 1:
-                self.results["X_wins"] += 1
-                temp_wins_x += 1
-            elif result == -1:
-                self.results["O_wins"] += 1
-                temp_wins_o += 1
-            else:
-                self.results["Draws"] += 1
-                temp_draws += 1
-
-            # Record checkpoint
-            if episode % self.checkpoint_interval == 0:
-                total = temp_wins_x + temp_wins_o + temp_draws
-                self.history["episodes"].append(episode)
-                self.history["x_win_rate"].append(100 * temp_wins_x / total)
-                self.history["o_win_rate"].append(100 * temp_wins_o / total)
-                self.history["draw_rate"].append(100 * temp_draws / total)
-                
-                # Reset temp counters
-                temp_wins_x = temp_wins_o = temp_draws = 0
-                
-                print(f"Episode {episode}/{self.episodes} completed...")
 
+        if self.batch and self.learn:
+            results = self._play_batches()
+        elif self.vector_size:
+            results = self._play_vectorized()
+        else:
+            results = (gm.play_game(train=self.learn) for _ in range(self.episodes - self.start_episode))
+        return self.record(results)
+
+    def record(self, results, stop=None):
+        """
+        Tally an iterable of game results (+1 X, -1 O, 0 draw) for the episodes
+        from start_episode up to `stop` (default: all) into results and
+        history. Progress output is written once all episodes are recorded.
+        """
+        raw = self._raw
+        interval = self.checkpoint_interval
+        stop = self.episodes if stop is None else stop
+
+        # Checkpoint rates and progress output are handled by a logging thread,
+        # which reports its failures (e.g. a checkpoint that cannot be saved) in `errors`
+        log_queue = queue.Queue(maxsize=8)
+        errors = []
+        logger = threading.Thread(target=self._log_checkpoints, args=(log_queue, errors), daemon=True)
+        logger.start()
+
+        # Fill raw one checkpoint interval at a time; only full intervals are checkpoints
+        results = iter(results)
+        try:
+            for start in range(self.start_episode, stop, interval):
+                if errors:
+                    break
+                end = min(start + interval, stop)
+                raw[start:end] = np.fromiter(islice(results, end - start), dtype=np.int8, count=end - start)
+
+                # Record checkpoint (each slot of raw is written once, so the view stays valid);
+                # Q-tables are copied here, while training is paused, and saved by the logging thread
+                if end - start == interval:
+                    q_tables = self._q_tables(copy=True) if self.checkpoint_dir else None
+                    log_queue.put((end, raw[start:end], q_tables))
+        finally:
+            log_queue.put(None)
+            logger.join()
+        if errors:
+            raise errors[0]
+        self.start_episode = stop
+        if stop == self.episodes:
+            self.flush_log()
+
+        o_wins, draws, x_wins = np.bincount(raw[:stop] + 1, minlength=3)
+        self.results = {"X_wins": int(x_wins), "O_wins": int(o_wins), "Draws": int(draws)}
         return self.results
 
+    def _log_checkpoints(self, log_queue, errors):
+        """
+        Logging thread: append checkpoint rates to history and log progress
+        until None arrives. An exception is appended to `errors` for record()
+        to raise; the queue is still drained so record() never blocks on it.
+        """
+        while True:
+            item = log_queue.get()
+            if item is None:
+                return
+            if errors:
+                continue
+            episode, chunk, q_tables = item
+            try:
+                self.history["episodes"].append(episode)
+                self.history["x_win_rate"].append(100 * np.count_nonzero(chunk == 1) / len(chunk))
+                self.history["o_win_rate"].append(100 * np.count_nonzero(chunk == -1) / len(chunk))
+                self.history["draw_rate"].append(100 * np.count_nonzero(chunk == 0) / len(chunk))
+
+                self.log(f"Episode {episode}/{self.episodes} completed...")
+                if q_tables is not None:
+                    self._save_checkpoint(episode, q_tables)
+            except Exception as exc:
+                errors.append(exc)
+
+    def _q_tables(self, copy=False):
+        """Q-tables of the learning agents, keyed Q_x / Q_o."""
+        agents = {"Q_x": self.agent_x, "Q_o": self.agent_o}
+        return {key: agent.q_table.copy() if copy else agent.q_table
+                for key, agent in agents.items() if hasattr(agent, "q_table")}
+
+    def _checkpoint_path(self, episode):
+        """Path of this run's checkpoint at `episode` in checkpoint_dir."""
+        return os.path.join(self.checkpoint_dir, f"{self.name.replace(' ', '_')}_{episode}.npz")
+
+    def _save_checkpoint(self, episode, q_tables):
+        """Write Q-tables, results so far and history to checkpoint_dir; keep the latest 3."""
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        path = self._checkpoint_path(episode)
+        history = {f"history_{key}": np.asarray(values) for key, values in self.history.items()}
+        np.savez_compressed(path, results=self._raw[:episode], **q_tables, **history)
+
+        if path in self._checkpoints:  # overwrote a file left by an earlier run
+            self._checkpoints.remove(path)
+        self._checkpoints.append(path)
+        while len(self._checkpoints) > 3:
+            os.remove(self._checkpoints.popleft())
+
+    def _existing_checkpoints(self):
+        """Checkpoint paths of this run already in checkpoint_dir, oldest episode first."""
+        if not self.checkpoint_dir or not os.path.isdir(self.checkpoint_dir):
+            return []
+        prefix = os.path.basename(self._checkpoint_path(0))[:-len("0.npz")]
+        episodes = []
+        for filename in os.listdir(self.checkpoint_dir):
+            episode = filename[len(prefix):-len(".npz")]
+            if filename.startswith(prefix) and filename.endswith(".npz") and episode.isdigit():
+                episodes.append(int(episode))
+        return [self._checkpoint_path(episode) for episode in sorted(episodes)]
+
+    def resume(self, path):
+        """
+        Restore Q-tables, results and history from a checkpoint written by
+        _save_checkpoint; the next train() plays only the remaining episodes.
+        Checkpoints of this run already in checkpoint_dir count towards the
+        latest 3 that are kept.
+        """
+        with np.load(path) as checkpoint:
+            played = len(checkpoint["results"])
+            if played > self.episodes:
+                raise ValueError(f"checkpoint {path!r} has {played} episodes, "
+                                 f"more than this trainer's {self.episodes}")
+            for key, q_table in self._q_tables().items():
+                q_table[:] = checkpoint[key]
+            self.start_episode = played
+            self._raw[:played] = checkpoint["results"]
+            for key in self.history:
+                self.history[key] = checkpoint[f"history_{key}"].tolist()
+        self._checkpoints = deque(self._existing_checkpoints())
+        return self.start_episode
+
+    def log(self, msg):
+        """Buffer a progress message until the next flush_log."""
+        self._log_buf.append(msg)
+
+    def flush_log(self):
+        """Write all buffered messages with a single stdout write."""
+        if self._log_buf:
+            sys.stdout.write("\n".join(self._log_buf) + "\n")
+            sys.stdout.flush()
+            self._log_buf.clear()
+
+    def _play_batches(self):
+        """Yield game results, playing one checkpoint interval per train_batch call."""
+        for start in range(self.start_episode, self.episodes, self.checkpoint_interval):
+            n = min(self.checkpoint_interval, self.episodes - start)
+            yield from self.agent_x.train_batch(n, self.agent_o)
+
+    def _play_vectorized(self):
+        """Yield game results, playing vector_size games per VectorGameManager step."""
+        vgm = VectorGameManager(self.agent_x, self.agent_o, batch_size=self.vector_size)
+        for start in range(self.start_episode, self.episodes, self.vector_size):
+            yield from vgm.play_batch(train=self.learn, n_games=min(self.vector_size, self.episodes - start))
+
     def get_statistics(self):
         """Returns performance statistics."""
         total = sum(self.results.values())
@@ -78,14 +234,76 @@ class Trainer:
         }
 
 
+def _run_training(config, episodes, solve_tabular, checkpoint_dir, n_workers=1):
+    """
+    Train one (learning agent, opponent, name) configuration; runs in one of
+    n_workers worker processes. Returns (trained agent, statistics, history).
+    """
+    learning_agent, opponent, name = config
+    # Split the cores between the workers rather than each starting a full thread pool
+    limit_kernel_threads((os.cpu_count() or 1) // n_workers)
+    trainer = Trainer(learning_agent, opponent, 
+                    episodes=episodes, 
+                    checkpoint_interval=1000,
+                    batch=isinstance(learning_agent, QLearningAgent),
+                    vector_size=64,
+                    name=name,
+                    checkpoint_dir=checkpoint_dir,
+                    learn=not solve_tabular)
+
+    # Worker output is buffered and written in one piece once training ends,
+    # so the processes don't contend for stdout at every checkpoint
+    trainer.log(f"\n{'='*70}")
+    trainer.log(f"Training: {name}")
+    trainer.log(f"{'='*70}")
+
+    if solve_tabular:
+        sweeps = learning_agent.solve()
+        trainer.log(f"Solved Q-table by value iteration ({sweeps} sweeps); playing the episodes without learning")
+
+    trainer.train()
+    learning_agent.freeze()
+    return learning_agent, trainer.get_statistics(), trainer.history
+
+
+def _warm_up_kernels():
+    """
+    Compile (or load from Numba's disk cache) the per-game self-play kernel
+    once in this process, so forked workers inherit it instead of each
+    compiling it. Only the serial kernel is run: starting the parallel
+    kernel's thread pool before forking can deadlock the workers at exit.
+    """
+    play_one_game(POLICY_Q_LEARNING, np.zeros((NUM_STATES, 9), dtype=np.float32), (0.1, 0.9, 0.2),
+                  POLICY_SCRIPTED, NO_Q_TABLE, (0.0, 0.0, 0.0))
+
+
 class TrainingOrchestrator:
     """Orchestrates training of multiple agents and comparison."""
     
-    def __init__(self, episodes_per_training=10000):
+    def __init__(self, episodes_per_training=10000, solve_tabular=False, fused=False,
+                 checkpoint_dir=None):
+        """
+        solve_tabular: fill each learning agent's Q-table by value iteration
+        instead of training it; the episodes are then played without learning
+        and only measure the solved policy (the Q-learning/SARSA updates would
+        read the solved values in the wrong frame and undo them).
+        fused: train all configurations in this process through a single
+        MultiExperimentRunner rollout instead of one worker process each.
+        checkpoint_dir: if set, each training run saves checkpoints there (see Trainer).
+        """
         self.episodes_per_training = episodes_per_training
+        self.solve_tabular = solve_tabular
+        self.fused = fused
+        self.checkpoint_dir = checkpoint_dir
         self.training_results = {}
         self.all_histories = {}
         self.trained_agents = {}
+        self.best_name = None  # training run with the highest win rate, set by train_all_agents
+
+        # Progress figure, created on the first plot_training_progress and reused after
+        self._figure = None
+        self._lines = {}  # (row, col) -> (x win, o win, draw) lines
+        self._slots = {}  # training name -> (row, col)
         
     def train_all_agents(self):
         """Train Q-Learning and SARSA agents against Random and Scripted opponents."""
@@ -100,74 +318,131 @@ class TrainingOrchestrator:
         sarsa_vs_random = SARSAAgent(alpha=0.1, gamma=0.9, epsilon=0.2, name="SARSA-vs-Random")
         sarsa_vs_scripted = SARSAAgent(alpha=0.1, gamma=0.9, epsilon=0.2, name="SARSA-vs-Scripted")
         
-        # Store trained agents
-        self.trained_agents = {
-            "Q-Learning (trained vs Random)": q_vs_random,
-            "Q-Learning (trained vs Scripted)": q_vs_scripted,
-            "SARSA (trained vs Random)": sarsa_vs_random,
-            "SARSA (trained vs Scripted)": sarsa_vs_scripted
-        }
-        
-        # Training configurations
+        # Training configurations: (key in trained_agents, learning agent, opponent, name)
         trainings = [
-            (q_vs_random, RandomAgent("Random"), "Q-Learning vs Random"),
-            (q_vs_scripted, ScriptedAgent("Scripted"), "Q-Learning vs Scripted"),
-            (sarsa_vs_random, RandomAgent("Random"), "SARSA vs Random"),
-            (sarsa_vs_scripted, ScriptedAgent("Scripted"), "SARSA vs Scripted")
+            ("Q-Learning (trained vs Random)", q_vs_random, RandomAgent("Random"), "Q-Learning vs Random"),
+            ("Q-Learning (trained vs Scripted)", q_vs_scripted, ScriptedAgent("Scripted"), "Q-Learning vs Scripted"),
+            ("SARSA (trained vs Random)", sarsa_vs_random, RandomAgent("Random"), "SARSA vs Random"),
+            ("SARSA (trained vs Scripted)", sarsa_vs_scripted, ScriptedAgent("Scripted"), "SARSA vs Scripted")
         ]
-        
-        # Train each configuration
-        for learning_agent, opponent, name in trainings:
-            print(f"\n{'='*70}")
-            print(f"Training: {name}")
-            print(f"{'='*70}")
-            
-            trainer = Trainer(learning_agent, opponent, 
-                            episodes=self.episodes_per_training, 
-                            checkpoint_interval=1000)
-            trainer.train()
-            
-            stats = trainer.get_statistics()
+
+        if self.fused:
+            outcomes = self._train_fused([config for _, *config in trainings])
+        else:
+            # Train all configurations in parallel worker processes; agents come back trained.
+            # Workers are forked where possible so they start with the warmed-up kernels.
+            _warm_up_kernels()
+            mp_context = multiprocessing.get_context("fork") if sys.platform == "linux" else None
+            with ProcessPoolExecutor(max_workers=len(trainings), mp_context=mp_context) as pool:
+                run = partial(_run_training, episodes=self.episodes_per_training,
+                              solve_tabular=self.solve_tabular, checkpoint_dir=self.checkpoint_dir,
+                              n_workers=len(trainings))
+                outcomes = list(pool.map(run, [config for _, *config in trainings]))
+
+        for (key, _, _, name), (trained_agent, stats, history) in zip(trainings, outcomes):
+            self.trained_agents[key] = trained_agent
             self.training_results[name] = stats
-            self.all_histories[name] = trainer.history
-            
+            self.all_histories[name] = history
+
             print(f"\nResults for {name}:")
             print(f"  Wins: {stats['x_wins']} ({stats['x_win_rate']:.2f}%)")
             print(f"  Losses: {stats['o_wins']} ({stats['o_win_rate']:.2f}%)")
             print(f"  Draws: {stats['draws']} ({stats['draw_rate']:.2f}%)")
-        
+
+        self.best_name = max(self.training_results,
+                             key=lambda name: self.training_results[name]['x_win_rate'])
         return self.trained_agents
     
+    def _train_fused(self, configs, batch_size=64):
+        """
+        Train every (learning agent, opponent, name) configuration together in
+        one MultiExperimentRunner rollout. Returns (trained agent, statistics,
+        history) per configuration, like _run_training.
+        """
+        episodes = self.episodes_per_training
+        if self.solve_tabular:
+            for learning_agent, _, _ in configs:
+                learning_agent.solve()
+
+        runner = MultiExperimentRunner([(agent, opponent) for agent, opponent, _ in configs],
+                                       batch_size=batch_size)
+        trainers = []
+        for learning_agent, opponent, name in configs:
+            trainer = Trainer(learning_agent, opponent, episodes=episodes, checkpoint_interval=1000,
+                              name=name, checkpoint_dir=self.checkpoint_dir)
+            trainer.log(f"\n{'='*70}")
+            trainer.log(f"Training: {name}")
+            trainer.log(f"{'='*70}")
+            trainers.append(trainer)
+
+        # Play one checkpoint interval at a time, so each checkpoint saves the Q-tables as of its episode
+        interval = trainers[0].checkpoint_interval
+        for start in range(0, episodes, interval):
+            stop = min(start + interval, episodes)
+            results = np.concatenate([runner.play_batch(train=not self.solve_tabular,
+                                                        n_games=min(batch_size, stop - first))
+                                      for first in range(start, stop, batch_size)], axis=1)
+            for trainer, experiment_results in zip(trainers, results):
+                trainer.record(experiment_results, stop=stop)
+
+        outcomes = []
+        for trainer in trainers:
+            trainer.agent_x.freeze()
+            outcomes.append((trainer.agent_x, trainer.get_statistics(), trainer.history))
+        return outcomes
+
     def plot_training_progress(self):
         """Plot win rates over time for all training sessions."""
+        # Imported here so training (and its worker processes) never loads matplotlib
+        import matplotlib
+        import matplotlib.pyplot as plt
+
+        if self._figure is None:
+            self._init_figure()
+        for name, history in self.all_histories.items():
+            self._update_figure(name, history)
+
+        self._figure.tight_layout()
+        self._figure.savefig('training_progress.png', dpi=300, bbox_inches='tight')
+        print("\n✓ Training progress plot saved as 'training_progress.png'")
+        if matplotlib.get_backend().lower() != 'agg':  # matplotlib falls back to Agg when headless
+            plt.show()
+
+    def _init_figure(self):
+        """Create the 2x2 figure once, with empty lines to be filled by _update_figure."""
+        import matplotlib.pyplot as plt
+
         fig, axes = plt.subplots(2, 2, figsize=(15, 10))
         fig.suptitle('Training Progress: Win Rates Over Time', fontsize=16, fontweight='bold')
-        
-        training_names = list(self.all_histories.keys())
-        
-        for idx, (name, history) in enumerate(self.all_histories.items()):
-            row = idx // 2
-            col = idx % 2
-            ax = axes[row, col]
-            
-            ax.plot(history['episodes'], history['x_win_rate'], 
-                   label='Learning Agent Win Rate', linewidth=2, marker='o')
-            ax.plot(history['episodes'], history['o_win_rate'], 
-                   label='Opponent Win Rate', linewidth=2, marker='s')
-            ax.plot(history['episodes'], history['draw_rate'], 
-                   label='Draw Rate', linewidth=2, marker='^')
-            
-            ax.set_xlabel('Episodes', fontsize=11)
-            ax.set_ylabel('Rate (%)', fontsize=11)
-            ax.set_title(name, fontsize=12, fontweight='bold')
-            ax.legend(loc='best')
-            ax.grid(True, alpha=0.3)
-            ax.set_ylim([0, 100])
-        
-        plt.tight_layout()
-        plt.savefig('training_progress.png', dpi=300, bbox_inches='tight')
-        print("\n✓ Training progress plot saved as 'training_progress.png'")
-        plt.show()
+
+        for row in range(2):
+            for col in range(2):
+                ax = axes[row, col]
+                line_x, = ax.plot([], [], label='Learning Agent Win Rate', linewidth=2, marker='o')
+                line_o, = ax.plot([], [], label='Opponent Win Rate', linewidth=2, marker='s')
+                line_d, = ax.plot([], [], label='Draw Rate', linewidth=2, marker='^')
+                self._lines[(row, col)] = (line_x, line_o, line_d)
+
+                ax.set_xlabel('Episodes', fontsize=11)
+                ax.set_ylabel('Rate (%)', fontsize=11)
+                ax.legend(loc='best')
+                ax.grid(True, alpha=0.3)
+                ax.set_ylim([0, 100])
+
+        self._figure = fig
+
+    def _update_figure(self, name, history):
+        """Point the lines of name's subplot (assigned in order of first use) at its history."""
+        row, col = self._slots.setdefault(name, divmod(len(self._slots), 2))
+        line_x, line_o, line_d = self._lines[(row, col)]
+        line_x.set_data(history['episodes'], history['x_win_rate'])
+        line_o.set_data(history['episodes'], history['o_win_rate'])
+        line_d.set_data(history['episodes'], history['draw_rate'])
+
+        ax = line_x.axes
+        ax.set_title(name, fontsize=12, fontweight='bold')
+        ax.relim()
+        ax.autoscale_view()
     
     def display_final_comparison(self):
         """Display a comparison of all trained agents."""
@@ -182,10 +457,9 @@ class TrainingOrchestrator:
             print(f"  Loss Rate:   {stats['o_win_rate']:.2f}%")
             print(f"  Draw Rate:   {stats['draw_rate']:.2f}%")
         
-        # Determine best performer
+        # Best performer (determined once by train_all_agents)
         print("\n" + "=" * 70)
-        best_agent = max(self.training_results.items(), 
-                        key=lambda x: x[1]['x_win_rate'])
-        print(f"🏆 BEST PERFORMER: {best_agent[0]}")
-        print(f"   Win Rate: {best_agent[1]['x_win_rate']:.2f}%")
+        best_stats = self.training_results[self.best_name]
+        print(f"🏆 BEST PERFORMER: {self.best_name}")
+        print(f"   Win Rate: {best_stats['x_win_rate']:.2f}%")
         print("=" * 70)
\ No newline at end of file